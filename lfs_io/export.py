@@ -1,11 +1,16 @@
 # Python imports
 import json
 import re
+import uuid
 import zipfile
-from io import StringIO
+from contextlib import contextmanager
 
 # django imports
-from django.http import HttpResponse
+from django.core.exceptions import ImproperlyConfigured
+from django.core.urlresolvers import reverse
+from django.db import connections
+from django.db import transaction
+from django.http import HttpResponseRedirect
 
 # lfs imports
 from lfs.catalog.models import GroupsPropertiesRelation
@@ -16,15 +21,175 @@ from lfs.catalog.models import ProductPropertyValue
 from lfs.catalog.models import Property
 from lfs.catalog.models import PropertyOption
 from lfs.catalog.settings import PROPERTY_SELECT_FIELD
+from lfs.export.models import CategoryOption
+from lfs.export.settings import CATEGORY_VARIANTS_ALL
+from lfs.export.settings import CATEGORY_VARIANTS_CHEAPEST
+from lfs.export.settings import CATEGORY_VARIANTS_DEFAULT
 from lfs.export.utils import register
 
+# lfs_io imports
+from lfs_io.models import ExportJob
+
+# Amount of products which are loaded at once
+CHUNK_SIZE = 200
+
 
 def export(request, export):
-    """Generic export method."""
-    buffer = StringIO.StringIO()
-    with zipfile.ZipFile(buffer, "w") as zf:
+    """Generic export method.
+
+    Queues the export for the background worker (see the ``lfs_io_worker``
+    management command) and redirects to the status page of the job.
+    """
+    job = ExportJob.objects.create(export=export)
+    return HttpResponseRedirect(reverse("lfs_io_export_status", kwargs={"job_id": job.id}))
+
+
+@contextmanager
+def snapshot(using):
+    """Runs the enclosed reads of passed database alias within one read-only
+    REPEATABLE READ transaction, hence the export is consistent even if
+    products are changed meanwhile.
+
+    Only PostgreSQL and MySQL are supported; other backends (e.g. SQLite,
+    which would lock out writers for the duration of the export) raise
+    ImproperlyConfigured.
+    """
+    connection = connections[using]
+    if connection.vendor not in ("postgresql", "mysql"):
+        raise ImproperlyConfigured(
+            "lfs_io: snapshot exports are not supported on {} (database {}).".format(connection.vendor, using)
+        )
+
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            else:
+                # Applies to the transaction which is started implicitly by
+                # the next statement
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        yield
+
+
+def write_archive(export, fileobj, progress=None, using=None):
+    """Writes the archive of passed export into passed file object.
+
+    ``progress`` is called with the amount of processed and total products
+    (without variants) after each product.
+
+    If ``using`` is given all products are read from this database alias
+    (e.g. a read replica) within one snapshot, see ``snapshot``.
+    """
+    if using is None:
+        _write_archive(export, fileobj, progress, using)
+    else:
+        with snapshot(using):
+            _write_archive(export, fileobj, progress, using)
+
+
+def _iter_products(export, progress, using):
+    """Yields the products of passed export like Export.get_products.
+
+    The products are loaded in chunks of CHUNK_SIZE by their ids, see
+    ``_iter_ids``. The queries per product (images, properties, etc.) return
+    only a few rows each and run within the same snapshot.
+    """
+    products = export.products.using(using).all()
+    total = products.count()
+    if progress is not None:
+        progress(0, total)
+    i = 0
+    for ids in _iter_ids(products):
+        chunk = products.in_bulk(ids)
+        for pk in ids:
+            i += 1
+            # Outside a snapshot the product may have been deleted or removed
+            # from the export since its id has been read.
+            product = chunk.get(pk)
+            if product is not None:
+                yield product
+                if product.is_product_with_variants():
+                    for variant in _get_variants(product, export, using):
+                        yield variant
+            if progress is not None:
+                progress(i, total)
+
+
+def _get_variants(product, export, using):
+    """Returns the variants of passed product for passed export like
+    lfs.export.utils.get_variants, but reads everything from passed database
+    alias and bypasses the cache of LFS.
+
+    The cheapest variant is determined by its effective price (LFS' own
+    implementation needs a request for the price calculator).
+    """
+    variants_option = _get_variants_option(product, export, using)
+    if variants_option is None:
+        variants_option = export.variants_option
+
+    variants = product.variants.using(using).filter(active=True).order_by("variant_position")
+    if variants_option == CATEGORY_VARIANTS_DEFAULT:
+        if product.default_variant_id:
+            default_variant = product.default_variant
+        else:
+            default_variant = variants.first()
+        return [default_variant] if default_variant is not None else []
+    elif variants_option == CATEGORY_VARIANTS_ALL:
+        return list(variants)
+    elif variants_option == CATEGORY_VARIANTS_CHEAPEST:
+        return list(variants.order_by("effective_price")[:1])
+    return []
+
+
+def _get_variants_option(product, export, using):
+    """Returns the variants option of the first category of passed product
+    (or of its parent categories) for passed export, or None.
+    """
+    if product.is_variant() and product.parent_id:
+        product = product.parent
+    category = product.categories.using(using).first()
+    while category is not None:
+        try:
+            category_option = CategoryOption.objects.using(using).get(export=export, category=category)
+        except CategoryOption.DoesNotExist:
+            category = category.parent
+        else:
+            return category_option.variants_option
+    return None
+
+
+def _iter_ids(products):
+    """Yields the ids of passed products in chunks of CHUNK_SIZE.
+
+    Within a snapshot on PostgreSQL the ids are fetched by a server-side
+    (named) cursor, which Django < 1.11 doesn't provide for
+    QuerySet.iterator(). Otherwise only the ids are loaded at once.
+    """
+    ids = products.values_list("pk", flat=True)
+    connection = connections[products.db]
+    if connection.vendor == "postgresql" and connection.in_atomic_block:
+        sql, params = ids.query.sql_with_params()
+        connection.ensure_connection()
+        cursor = connection.connection.cursor(name="lfs_io_export_{}".format(uuid.uuid4().hex))
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(CHUNK_SIZE)
+                if not rows:
+                    break
+                yield [row[0] for row in rows]
+        finally:
+            cursor.close()
+    else:
+        ids = list(ids)
+        for i in range(0, len(ids), CHUNK_SIZE):
+            yield ids[i:i + CHUNK_SIZE]
+
+
+def _write_archive(export, fileobj, progress, using):
+    with zipfile.ZipFile(fileobj, "w") as zf:
         result = []
-        for product in export.get_products():
+        for product in _iter_products(export, progress, using):
             # Images
             images = []
             for image in product.images.all():
@@ -54,7 +219,7 @@ def export(request, export):
 
             # Accessories
             accessories = []
-            for accessory in ProductAccessories.objects.filter(product=product):
+            for accessory in ProductAccessories.objects.using(using).filter(product=product):
                 accessories.append(
                     {
                         "uid": accessory.accessory.uid,
@@ -74,7 +239,7 @@ def export(request, export):
             # price calculation
             def replace_id(match):
                 try:
-                    prop = Property.objects.get(pk=match.groups()[0])
+                    prop = Property.objects.using(using).get(pk=match.groups()[0])
                 except Property.DoesNotExist:
                     return "property({})".format(match.groups()[0])
                 else:
@@ -87,14 +252,14 @@ def export(request, export):
                 category_variant = product.category_variant
             else:
                 try:
-                    variant = Product.objects.get(pk=product.category_variant)
+                    variant = Product.objects.using(using).get(pk=product.category_variant)
                     category_variant = variant.uid
                 except Product.DoesNotExist:
                     category_variant = None
 
             # Local properties (atm only local properties have an ProductsPropertiesRelation)
             local_properties = []
-            for ppr in ProductsPropertiesRelation.objects.filter(product=product):
+            for ppr in ProductsPropertiesRelation.objects.using(using).filter(product=product):
                 options = []
                 for option in ppr.property.options.all():
                     options.append(
@@ -121,7 +286,7 @@ def export(request, export):
             property_groups = []
             for property_group in product.property_groups.all():
                 properties = []
-                for gpr in GroupsPropertiesRelation.objects.filter(group=property_group):
+                for gpr in GroupsPropertiesRelation.objects.using(using).filter(group=property_group):
                     options = []
                     for option in gpr.property.options.all():
                         options.append(
@@ -191,10 +356,10 @@ def export(request, export):
 
             # Property values (local and global)
             property_values = []
-            for ppv in ProductPropertyValue.objects.filter(product=product):
-                parent_temp = Product.objects.get(pk=ppv.parent_id)
+            for ppv in ProductPropertyValue.objects.using(using).filter(product=product):
+                parent_temp = Product.objects.using(using).get(pk=ppv.parent_id)
                 if ppv.property.local or (ppv.property.type == PROPERTY_SELECT_FIELD):
-                    option_temp = PropertyOption.objects.get(pk=ppv.value)
+                    option_temp = PropertyOption.objects.using(using).get(pk=ppv.value)
                     value = option_temp.uid
                 else:
                     value = ppv.value
@@ -301,9 +466,5 @@ def export(request, export):
             )
         zf.writestr("data.json", json.dumps(result))
 
-    response = HttpResponse(buffer.getvalue(), content_type="application/zip")
-    response["Content-Disposition"] = "attachment; filename=%s.zip" % export.name
-    return response
-
 
 register(export, "io")
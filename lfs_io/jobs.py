@@ -0,0 +1,175 @@
+# Python imports
+import datetime
+import tempfile
+import threading
+import traceback
+
+# django imports
+from django.core.files import File
+from django.db import connections
+from django.utils import timezone
+from django.utils.six.moves import queue
+
+# lfs_io imports
+from lfs_io import settings as lfs_io_settings
+from lfs_io.export import write_archive
+from lfs_io.models import ExportJob
+from lfs_io.models import EXPORT_JOB_FAILED
+from lfs_io.models import EXPORT_JOB_FINISHED
+from lfs_io.models import EXPORT_JOB_PENDING
+from lfs_io.models import EXPORT_JOB_RUNNING
+
+# Load logger
+import logging
+
+logger = logging.getLogger("lfs")
+
+# Progress is written to the database every PROGRESS_STEP products, but at
+# least every HEARTBEAT seconds
+PROGRESS_STEP = 50
+HEARTBEAT = 60
+
+
+def claim_next_job():
+    """Returns the oldest pending export job and marks it as running, or None
+    if there is no pending job.
+
+    The status is switched with a conditional update, hence several workers
+    can run side by side without processing the same job twice.
+    """
+    for job in ExportJob.objects.filter(status=EXPORT_JOB_PENDING).order_by("created"):
+        now = timezone.now()
+        claimed = ExportJob.objects.filter(pk=job.pk, status=EXPORT_JOB_PENDING).update(
+            status=EXPORT_JOB_RUNNING,
+            started=now,
+            updated=now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+class ProgressWriter(threading.Thread):
+    """Writes the progress of passed job within an own thread and hence with
+    an own database connection. So the progress is also written while the
+    export reads within a read-only snapshot of the database which holds the
+    jobs.
+    """
+    def __init__(self, job):
+        super(ProgressWriter, self).__init__()
+        self.daemon = True
+        self.job = job
+        self.items = queue.Queue()
+
+    def write(self, processed, total, updated):
+        self.items.put((processed, total, updated))
+
+    def stop(self):
+        self.items.put(None)
+        self.join()
+
+    def run(self):
+        try:
+            while True:
+                item = self.items.get()
+                if item is None:
+                    break
+                processed, total, updated = item
+                try:
+                    ExportJob.objects.filter(pk=self.job.pk).update(
+                        processed=processed,
+                        total=total,
+                        updated=updated,
+                    )
+                except Exception:
+                    logger.exception("Progress of export job not written {}".format(self.job.id))
+        finally:
+            # Closes the connections of this thread only
+            connections.close_all()
+
+
+def run_job(job, using=None):
+    """Writes the archive of passed (running) job to the storage.
+
+    ``using`` is the database alias the products are read from, see
+    ``lfs_io.export.write_archive``. Defaults to ``LFS_IO_EXPORT_DATABASE``.
+    """
+    if using is None:
+        using = lfs_io_settings.EXPORT_DATABASE
+
+    writer = ProgressWriter(job)
+    last_update = [timezone.now()]
+
+    def progress(processed, total):
+        now = timezone.now()
+        if (
+            processed % PROGRESS_STEP == 0
+            or processed == total
+            or (now - last_update[0]).total_seconds() >= HEARTBEAT
+        ):
+            writer.write(processed, total, now)
+            last_update[0] = now
+
+    logger.info("Export job started {}".format(job.id))
+    writer.start()
+    try:
+        with tempfile.TemporaryFile() as fp:
+            try:
+                write_archive(job.export, fp, progress, using)
+            finally:
+                writer.stop()
+            fp.seek(0)
+            # Heartbeat, as saving the archive to the storage may take a while
+            ExportJob.objects.filter(pk=job.pk, status=EXPORT_JOB_RUNNING).update(updated=timezone.now())
+            job.file.save("{}-{}.zip".format(job.export.slug, job.id), File(fp), save=False)
+    except Exception:
+        logger.exception("Export job failed {}".format(job.id))
+        ExportJob.objects.filter(pk=job.pk, status=EXPORT_JOB_RUNNING).update(
+            status=EXPORT_JOB_FAILED,
+            error=traceback.format_exc(),
+            finished=timezone.now(),
+        )
+    else:
+        # The job may have been marked as failed meanwhile (see cleanup_jobs)
+        finished = ExportJob.objects.filter(pk=job.pk, status=EXPORT_JOB_RUNNING).update(
+            status=EXPORT_JOB_FINISHED,
+            file=job.file.name,
+            finished=timezone.now(),
+        )
+        if finished:
+            logger.info("Export job finished {}".format(job.id))
+        else:
+            logger.info("Export job has been stopped meanwhile {}".format(job.id))
+            job.file.delete(save=False)
+
+
+def cleanup_jobs():
+    """Marks running jobs as failed which haven't been updated for
+    ``LFS_IO_EXPORT_TIMEOUT`` minutes (their worker has died) and deletes
+    finished and failed jobs including their archives, which are older than
+    ``LFS_IO_EXPORT_RETENTION_DAYS``.
+    """
+    now = timezone.now()
+    stale = ExportJob.objects.filter(
+        status=EXPORT_JOB_RUNNING,
+        updated__lt=now - datetime.timedelta(minutes=lfs_io_settings.EXPORT_TIMEOUT),
+    )
+    for job in stale:
+        logger.info("Export job timed out {}".format(job.id))
+    stale.update(
+        status=EXPORT_JOB_FAILED,
+        error="The export has been stopped without finishing (e.g. its worker has been killed).",
+        finished=now,
+    )
+
+    limit = now - datetime.timedelta(days=lfs_io_settings.EXPORT_RETENTION_DAYS)
+    jobs = ExportJob.objects.filter(
+        status__in=(EXPORT_JOB_FINISHED, EXPORT_JOB_FAILED),
+        finished__lt=limit,
+    )
+    for job in jobs:
+        logger.info("Export job deleted {}".format(job.id))
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
@@ -0,0 +1,48 @@
+# Python imports
+import time
+
+# django imports
+from django.core.management.base import BaseCommand
+
+# lfs_io imports
+from lfs_io import settings as lfs_io_settings
+from lfs_io.jobs import claim_next_job
+from lfs_io.jobs import cleanup_jobs
+from lfs_io.jobs import run_job
+
+
+class Command(BaseCommand):
+    help = "Processes queued lfs_io exports and removes expired archives."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            dest="once",
+            default=False,
+            help="Process all pending exports and exit.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            dest="interval",
+            default=lfs_io_settings.WORKER_INTERVAL,
+            help="Seconds to wait for new exports.",
+        )
+        parser.add_argument(
+            "--database",
+            dest="database",
+            default=lfs_io_settings.EXPORT_DATABASE,
+            help="Database alias (e.g. a read replica) the products are read from within one snapshot.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            cleanup_jobs()
+            job = claim_next_job()
+            if job is not None:
+                run_job(job, options["database"])
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('export', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('status', models.PositiveSmallIntegerField(default=0, verbose_name='Status', choices=[(0, 'Pending'), (1, 'Running'), (2, 'Finished'), (3, 'Failed')])),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Processed')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total')),
+                ('file', models.FileField(upload_to='lfs_io/exports', verbose_name='File', blank=True)),
+                ('error', models.TextField(verbose_name='Error', blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('started', models.DateTimeField(null=True, verbose_name='Started', blank=True)),
+                ('finished', models.DateTimeField(null=True, verbose_name='Finished', blank=True)),
+                ('export', models.ForeignKey(related_name='io_jobs', on_delete=django.db.models.deletion.CASCADE, verbose_name='Export', to='export.Export')),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# django imports
+from django.core.urlresolvers import reverse
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+# lfs imports
+from lfs.export.models import Export
+
+EXPORT_JOB_PENDING = 0
+EXPORT_JOB_RUNNING = 1
+EXPORT_JOB_FINISHED = 2
+EXPORT_JOB_FAILED = 3
+EXPORT_JOB_STATUS_CHOICES = (
+    (EXPORT_JOB_PENDING, _(u"Pending")),
+    (EXPORT_JOB_RUNNING, _(u"Running")),
+    (EXPORT_JOB_FINISHED, _(u"Finished")),
+    (EXPORT_JOB_FAILED, _(u"Failed")),
+)
+
+
+class ExportJob(models.Model):
+    """A queued export which is processed by the ``lfs_io_worker`` management
+    command. The generated archive is saved to ``file``.
+
+    ``updated`` is refreshed by the worker while the job is running. Running
+    jobs which haven't been updated for ``LFS_IO_EXPORT_TIMEOUT`` minutes are
+    considered dead and marked as failed.
+    """
+    export = models.ForeignKey(Export, models.CASCADE, verbose_name=_(u"Export"), related_name="io_jobs")
+    status = models.PositiveSmallIntegerField(
+        _(u"Status"), choices=EXPORT_JOB_STATUS_CHOICES, default=EXPORT_JOB_PENDING
+    )
+    processed = models.PositiveIntegerField(_(u"Processed"), default=0)
+    total = models.PositiveIntegerField(_(u"Total"), default=0)
+    file = models.FileField(_(u"File"), upload_to="lfs_io/exports", blank=True)
+    error = models.TextField(_(u"Error"), blank=True)
+    created = models.DateTimeField(_(u"Created"), auto_now_add=True)
+    started = models.DateTimeField(_(u"Started"), blank=True, null=True)
+    finished = models.DateTimeField(_(u"Finished"), blank=True, null=True)
+    updated = models.DateTimeField(_(u"Updated"), blank=True, null=True)
+
+    class Meta:
+        ordering = ("-created", )
+
+    def __unicode__(self):
+        return u"%s (%s)" % (self.export.name, self.get_status_display())
+
+    def get_absolute_url(self):
+        return reverse("lfs_io_export_status", kwargs={"job_id": self.id})
+
+    def get_download_url(self):
+        """Returns the download url of the archive or None if it isn't
+        available (yet).
+        """
+        if self.status != EXPORT_JOB_FINISHED or not self.file:
+            return None
+        return reverse("lfs_io_export_download", kwargs={"job_id": self.id})
+
+    def is_done(self):
+        """Returns True if the job has been finished or has failed."""
+        return self.status in (EXPORT_JOB_FINISHED, EXPORT_JOB_FAILED)
+
+    def get_percent(self):
+        if not self.total:
+            return 100 if self.status == EXPORT_JOB_FINISHED else 0
+        return int(100 * self.processed / self.total)
@@ -0,0 +1,115 @@
+# Python imports
+import sys
+import threading
+
+# django imports
+from django.utils import six
+from django.utils.six.moves import queue
+
+# lfs_io imports
+from lfs_io import settings as lfs_io_settings
+
+_DONE = object()
+
+
+class _Failure(object):
+    """Carries an exception of the reader thread to the consumer."""
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+
+class _Budget(object):
+    """Limits the decompressed bytes of the queued media."""
+    def __init__(self, size):
+        self.size = size
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, amount, stop):
+        """Waits until amount fits into the budget, unless the consumer has
+        stopped. A product which exceeds the whole budget is admitted if
+        nothing else is queued. Returns True if the amount has been acquired.
+        """
+        with self.condition:
+            while self.used and self.used + amount > self.size:
+                if stop.is_set():
+                    return False
+                self.condition.wait(0.1)
+            self.used += amount
+            return True
+
+    def release(self, amount):
+        with self.condition:
+            self.used -= amount
+            self.condition.notify_all()
+
+
+def read_products(zf, data, size=None, max_bytes=None):
+    """Yields (product, media) for the passed product records, whereas media
+    is a dict of the decompressed images and attachments by path.
+
+    The media are read from the archive within a separate thread ahead of the
+    consumer (which writes to the database). The read-ahead is limited to
+    ``max_bytes`` decompressed bytes of media (default:
+    ``LFS_IO_IMPORT_QUEUE_BYTES``) and at most ``size`` products (default:
+    ``LFS_IO_IMPORT_QUEUE_SIZE``). A single product which is larger than the
+    budget is read only if nothing else is queued. An exception within the
+    reader is re-raised by the consumer, if the consumer stops the reader is
+    stopped as well.
+    """
+    if size is None:
+        size = lfs_io_settings.IMPORT_QUEUE_SIZE
+    if max_bytes is None:
+        max_bytes = lfs_io_settings.IMPORT_QUEUE_BYTES
+    items = queue.Queue(maxsize=size)
+    budget = _Budget(max_bytes)
+    stop = threading.Event()
+
+    reader = threading.Thread(target=_read, args=(zf, data, items, budget, stop))
+    reader.daemon = True
+    reader.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                six.reraise(*item.exc_info)
+            product, media, amount = item
+            budget.release(amount)
+            yield product, media
+    finally:
+        stop.set()
+        reader.join()
+
+
+def _read(zf, data, items, budget, stop):
+    try:
+        for product in data:
+            paths = [item["path"] for item in product["images"] + product["attachments"]]
+            # The sizes are known before decompression
+            amount = sum(zf.getinfo(path).file_size for path in paths)
+            if not budget.acquire(amount, stop):
+                return
+            media = {}
+            for path in paths:
+                media[path] = zf.read(path)
+            if not _put(items, (product, media, amount), stop):
+                return
+    except Exception:
+        _put(items, _Failure(sys.exc_info()), stop)
+    else:
+        _put(items, _DONE, stop)
+
+
+def _put(items, item, stop):
+    """Puts item into the queue unless the consumer has stopped. Returns True
+    if the item has been put.
+    """
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+        except queue.Full:
+            continue
+        return True
+    return False
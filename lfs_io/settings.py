@@ -0,0 +1,23 @@
+# django imports
+from django.conf import settings
+
+# Days after which finished export archives are deleted by the worker
+EXPORT_RETENTION_DAYS = getattr(settings, "LFS_IO_EXPORT_RETENTION_DAYS", 7)
+
+# Minutes after which a running export without progress is marked as failed
+# (e.g. because its worker has been killed)
+EXPORT_TIMEOUT = getattr(settings, "LFS_IO_EXPORT_TIMEOUT", 30)
+
+# Seconds the worker sleeps when there is no pending export
+WORKER_INTERVAL = getattr(settings, "LFS_IO_WORKER_INTERVAL", 5)
+
+# Decompressed bytes of images and attachments which are read from the
+# archive ahead of the database writes during an import
+IMPORT_QUEUE_BYTES = getattr(settings, "LFS_IO_IMPORT_QUEUE_BYTES", 64 * 1024 * 1024)
+
+# Maximal amount of products which are read ahead (additionally to the bytes)
+IMPORT_QUEUE_SIZE = getattr(settings, "LFS_IO_IMPORT_QUEUE_SIZE", 50)
+
+# Database alias (e.g. a read replica) the exports are read from within one
+# read-only snapshot. None reads through the default routing without snapshot.
+EXPORT_DATABASE = getattr(settings, "LFS_IO_EXPORT_DATABASE", None)
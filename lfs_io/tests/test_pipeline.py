@@ -0,0 +1,91 @@
+# Python imports
+import threading
+import time
+
+# django imports
+from django.test import SimpleTestCase
+
+# lfs_io imports
+from lfs_io.pipeline import read_products
+
+
+class FakeInfo(object):
+    def __init__(self, file_size):
+        self.file_size = file_size
+
+
+class FakeZipFile(object):
+    """Returns the path as content and raises IOError for ``broken`` paths.
+    Every member has a size of ``file_size``.
+    """
+    def __init__(self, broken=(), file_size=100):
+        self.broken = broken
+        self.file_size = file_size
+        self.reads = 0
+
+    def getinfo(self, path):
+        return FakeInfo(self.file_size)
+
+    def read(self, path):
+        self.reads += 1
+        if path in self.broken:
+            raise IOError("Cannot read {}".format(path))
+        return path.encode("utf-8")
+
+
+def _product(uid):
+    return {
+        "uid": uid,
+        "images": [{"path": "images/{}.jpg".format(uid)}],
+        "attachments": [{"path": "files/{}.pdf".format(uid)}],
+    }
+
+
+class ReadProductsTestCase(SimpleTestCase):
+    def test_read(self):
+        data = [_product(str(i)) for i in range(10)]
+        result = list(read_products(FakeZipFile(), data, size=2))
+        self.assertEqual([product for product, media in result], data)
+        self.assertEqual(result[3][1], {"images/3.jpg": b"images/3.jpg", "files/3.pdf": b"files/3.pdf"})
+
+    def test_reader_error(self):
+        data = [_product(str(i)) for i in range(10)]
+        products = read_products(FakeZipFile(broken=["files/5.pdf"]), data, size=2)
+        read = []
+        with self.assertRaises(IOError):
+            for product, media in products:
+                read.append(product["uid"])
+        self.assertEqual(read, ["0", "1", "2", "3", "4"])
+
+    def test_consumer_error(self):
+        threads = threading.active_count()
+        zf = FakeZipFile()
+        data = [_product(str(i)) for i in range(1000)]
+        products = read_products(zf, data, size=2)
+        try:
+            for product, media in products:
+                raise ValueError()
+        except ValueError:
+            products.close()
+
+        # The reader is joined on close and has stopped far before the end
+        self.assertEqual(threading.active_count(), threads)
+        self.assertTrue(zf.reads < 20)
+
+    def test_byte_budget(self):
+        zf = FakeZipFile(file_size=100)
+        data = [_product(str(i)) for i in range(100)]
+        products = read_products(zf, data, size=50, max_bytes=400)
+        try:
+            next(products)
+            time.sleep(0.3)
+            # 200 bytes per product: at most two products are queued besides
+            # the consumed one
+            self.assertTrue(zf.reads <= 6)
+        finally:
+            products.close()
+
+    def test_product_larger_than_budget(self):
+        data = [_product(str(i)) for i in range(5)]
+        result = list(read_products(FakeZipFile(file_size=100), data, max_bytes=10))
+        self.assertEqual([product for product, media in result], data)
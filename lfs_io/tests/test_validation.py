@@ -0,0 +1,189 @@
+# Python imports
+import io
+import json
+import zipfile
+
+# django imports
+from django.test import SimpleTestCase
+
+# lfs imports
+from lfs.catalog.settings import PROPERTY_SELECT_FIELD
+
+# lfs_io imports
+from lfs_io import validation
+from lfs_io.validation import ArchiveError
+from lfs_io.validation import load_archive
+
+
+DEFAULTS = {
+    validation.STRING: "",
+    validation.INTEGER: 0,
+    validation.NUMBER: 0.0,
+    validation.BOOLEAN: False,
+    validation.VALUE: "",
+}
+
+
+def _defaults(keys, types):
+    record = dict((key, "") for key in keys)
+    record.update(dict((key, DEFAULTS[type]) for key, (type, nullable) in types.items()))
+    return record
+
+
+def _product(uid, **kwargs):
+    product = _defaults(validation.PRODUCT_KEYS, validation.PRODUCT_TYPES)
+    product.update(dict((key, []) for key in validation.LIST_KEYS))
+    product["uid"] = uid
+    product.update(kwargs)
+    return product
+
+
+def _property(uid, options=(), type=PROPERTY_SELECT_FIELD):
+    prop = _defaults(validation.PROPERTY_KEYS, validation.PROPERTY_TYPES)
+    prop.update(
+        {
+            "uid": uid,
+            "type": type,
+            "local": False,
+            "options": [{"uid": option, "name": option, "price": 0.0, "position": 10} for option in options],
+            "steps": [],
+        }
+    )
+    return prop
+
+
+def _archive(data, members=()):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("data.json", json.dumps(data))
+        for member in members:
+            zf.writestr(member, b"data")
+    buffer.seek(0)
+    return buffer
+
+
+class LoadArchiveTestCase(SimpleTestCase):
+    def assertErrors(self, fileobj, errors):
+        with self.assertRaises(ArchiveError) as cm:
+            load_archive(fileobj)
+        self.assertEqual(cm.exception.errors, errors)
+
+    def test_valid(self):
+        group = {"uid": "g1", "name": "Group", "position": 10, "properties": [_property("p1", ["o1"])]}
+        data = [
+            _product(
+                "a",
+                tax=19.0,
+                images=[{"path": "images/a.jpg", "name": "a.jpg", "title": "A", "position": 10}],
+                property_groups=[group],
+            ),
+            _product(
+                "b",
+                parent="a",
+                property_values=[{"property": "p1", "parent": "a", "value": "o1", "type": 2}],
+            ),
+        ]
+        zf, result = load_archive(_archive(data, ["images/a.jpg"]))
+        self.assertEqual(result, data)
+        self.assertEqual(zf.read("images/a.jpg"), b"data")
+
+    def test_no_file(self):
+        self.assertErrors(None, ["No file uploaded"])
+
+    def test_invalid_zip(self):
+        with self.assertRaises(ArchiveError):
+            load_archive(io.BytesIO(b"no zip"))
+
+    def test_missing_data(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zf:
+            zf.writestr("other.json", "[]")
+        buffer.seek(0)
+        self.assertErrors(buffer, ["Missing data.json"])
+
+    def test_missing_key(self):
+        product = _product("a")
+        del product["parent"]
+        del product["tax"]
+        self.assertErrors(_archive([product]), ["Product #0 a: missing tax, parent"])
+
+    def test_invalid_tax(self):
+        with self.assertRaises(ArchiveError) as cm:
+            load_archive(_archive([_product("a", tax="abc")]))
+        self.assertEqual(len(cm.exception.errors), 1)
+        self.assertTrue(cm.exception.errors[0].startswith("Product a: invalid tax"))
+
+    def test_invalid_string(self):
+        self.assertErrors(
+            _archive([_product("a", price_calculation=None)]),
+            ["Product a: price_calculation must be a string, not None"],
+        )
+
+    def test_invalid_number(self):
+        self.assertErrors(
+            _archive([_product("a", weight=None, stock_amount=[])]),
+            ["Product a: stock_amount must be a number, not []", "Product a: weight must be a number, not None"],
+        )
+
+    def test_invalid_integer(self):
+        self.assertErrors(
+            _archive([_product("a", variant_position=1.5)]),
+            ["Product a: variant_position must be an integer, not 1.5"],
+        )
+
+    def test_invalid_boolean(self):
+        self.assertErrors(_archive([_product("a", active=1)]), ["Product a: active must be a boolean, not 1"])
+
+    def test_invalid_property_values(self):
+        prop = _property("p1", ["o1"])
+        prop["options"][0]["price"] = []
+        prop["steps"] = [{"start": None}]
+        group = {"uid": "g1", "name": "Group", "position": 10, "properties": [prop]}
+        self.assertErrors(
+            _archive([_product("a", property_groups=[group])]),
+            [
+                "Product a: property p1: option o1: price must be a number, not []",
+                "Product a: property group g1: property p1: step: start must be a number, not None",
+            ],
+        )
+
+    def test_dangling_parent(self):
+        self.assertErrors(_archive([_product("a", parent="x")]), ["Product a: parent x not found"])
+
+    def test_dangling_property(self):
+        data = [_product("a", property_values=[{"property": "x", "parent": "a", "value": "1", "type": 2}])]
+        self.assertErrors(_archive(data), ["Product a: property x of property value not found"])
+
+    def test_dangling_option(self):
+        group = {"uid": "g1", "name": "Group", "position": 10, "properties": [_property("p1", ["o1"])]}
+        data = [
+            _product(
+                "a",
+                property_groups=[group],
+                property_values=[{"property": "p1", "parent": "a", "value": "x", "type": 2}],
+            )
+        ]
+        self.assertErrors(_archive(data), ["Product a: option x of property p1 not found"])
+
+    def test_missing_media(self):
+        data = [
+            _product(
+                "a",
+                images=[{"path": "images/a.jpg", "name": "a.jpg", "title": "A", "position": 10}],
+                attachments=[
+                    {"path": "files/a.pdf", "name": "a.pdf", "title": "A", "description": "", "position": 10}
+                ],
+            )
+        ]
+        self.assertErrors(
+            _archive(data),
+            ["Product a: image images/a.jpg not found", "Product a: attachment files/a.pdf not found"],
+        )
+
+    def test_max_errors(self):
+        data = [_product(str(i), tax="abc") for i in range(validation.MAX_ERRORS * 2)]
+        with self.assertRaises(ArchiveError) as cm:
+            load_archive(_archive(data))
+        errors = cm.exception.errors
+        self.assertEqual(len(errors), validation.MAX_ERRORS + 1)
+        self.assertEqual(errors[-1], "Too many errors, validation stopped")
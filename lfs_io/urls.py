@@ -4,4 +4,6 @@ from . import views
 
 urlpatterns = [
     url(r"^import$", views.import_view, name="import"),
+    url(r"^export/(?P<job_id>\d+)$", views.export_status_view, name="lfs_io_export_status"),
+    url(r"^export/(?P<job_id>\d+)/download$", views.export_download_view, name="lfs_io_export_download"),
 ]
@@ -0,0 +1,311 @@
+# Python imports
+import json
+import zipfile
+
+# django imports
+from django.utils import six
+
+# lfs imports
+from lfs.catalog.settings import PROPERTY_SELECT_FIELD
+
+# Validation stops after MAX_ERRORS errors
+MAX_ERRORS = 100
+
+PRODUCT_KEYS = (
+    "uid", "name", "sku", "slug", "price", "effective_price", "price_unit", "unit", "short_description",
+    "description", "meta_title", "meta_description", "for_sale", "for_sale_price", "active", "deliverable",
+    "manual_delivery_time", "order_time", "ordered_at", "manage_stock_amount", "stock_amount",
+    "active_packing_unit", "packing_unit", "packing_unit_unit", "weight", "height", "length", "width", "tax",
+    "sub_type", "default_variant", "category_variant", "variants_display_type", "variant_position", "parent",
+    "active_name", "active_sku", "active_short_description", "active_static_block", "active_description",
+    "active_price", "active_for_sale", "active_for_sale_price", "active_images", "active_related_products",
+    "active_accessories", "active_meta_title", "active_meta_description", "active_meta_keywords",
+    "active_dimensions", "active_price_calculation", "price_calculation", "active_base_price", "base_price_unit",
+    "base_price_amount", "sku_manufacturer", "manufacturer", "type_of_quantity_field", "related_products",
+    "accessories", "images", "attachments", "local_properties", "property_values", "property_groups",
+)
+LIST_KEYS = (
+    "related_products", "accessories", "images", "attachments", "local_properties", "property_values",
+    "property_groups",
+)
+DELIVERY_TIME_KEYS = ("min", "max", "unit", "description")
+IMAGE_KEYS = ("path", "name", "title", "position")
+ATTACHMENT_KEYS = ("path", "name", "title", "description", "position")
+ACCESSORY_KEYS = ("uid", "position", "quantity")
+OPTION_KEYS = ("uid", "name", "price", "position")
+LOCAL_PROPERTY_KEYS = ("uid", "name", "title", "type", "position", "options")
+PROPERTY_GROUP_KEYS = ("uid", "name", "position", "properties")
+PROPERTY_KEYS = (
+    "uid", "name", "title", "type", "position", "group_position", "local", "unit", "display_on_product",
+    "variants", "filterable", "configurable", "price", "display_price", "add_price", "unit_min", "unit_max",
+    "unit_step", "decimal_places", "required", "step_type", "step", "options", "steps",
+)
+STEP_KEYS = ("start", )
+PROPERTY_VALUE_KEYS = ("property", "parent", "value", "type")
+
+# Types of the values which are written by the import: key -> (type, nullable)
+STRING = "a string"
+INTEGER = "an integer"
+NUMBER = "a number"
+BOOLEAN = "a boolean"
+VALUE = "a string or a number"
+
+PRODUCT_TYPES = {
+    "name": (STRING, False), "sku": (STRING, False), "slug": (STRING, False), "price": (NUMBER, False),
+    "effective_price": (NUMBER, False), "price_unit": (STRING, False), "unit": (STRING, False),
+    "short_description": (STRING, False), "description": (STRING, False), "meta_title": (STRING, False),
+    "meta_description": (STRING, False), "for_sale": (BOOLEAN, False), "for_sale_price": (NUMBER, False),
+    "active": (BOOLEAN, False), "deliverable": (BOOLEAN, False), "manual_delivery_time": (BOOLEAN, False),
+    "ordered_at": (STRING, False), "manage_stock_amount": (BOOLEAN, False), "stock_amount": (NUMBER, False),
+    "active_packing_unit": (INTEGER, False), "packing_unit": (NUMBER, True), "packing_unit_unit": (STRING, True),
+    "weight": (NUMBER, False), "height": (NUMBER, False), "length": (NUMBER, False), "width": (NUMBER, False),
+    "sub_type": (STRING, False), "default_variant": (STRING, False), "variants_display_type": (INTEGER, False),
+    "variant_position": (INTEGER, False), "parent": (STRING, False), "active_name": (BOOLEAN, False),
+    "active_sku": (BOOLEAN, False), "active_short_description": (BOOLEAN, False),
+    "active_static_block": (BOOLEAN, False), "active_description": (BOOLEAN, False),
+    "active_price": (BOOLEAN, False), "active_for_sale": (INTEGER, False), "active_for_sale_price": (BOOLEAN, False),
+    "active_images": (BOOLEAN, False), "active_related_products": (BOOLEAN, False),
+    "active_accessories": (BOOLEAN, False), "active_meta_title": (BOOLEAN, False),
+    "active_meta_description": (BOOLEAN, False), "active_meta_keywords": (BOOLEAN, False),
+    "active_dimensions": (BOOLEAN, False), "active_price_calculation": (BOOLEAN, False),
+    "price_calculation": (STRING, False), "active_base_price": (INTEGER, False), "base_price_unit": (STRING, True),
+    "base_price_amount": (NUMBER, True), "sku_manufacturer": (STRING, False), "manufacturer": (STRING, False),
+    "type_of_quantity_field": (INTEGER, True),
+}
+DELIVERY_TIME_TYPES = {"min": (NUMBER, False), "max": (NUMBER, False), "unit": (INTEGER, False),
+                       "description": (STRING, False)}
+IMAGE_TYPES = {"path": (STRING, False), "name": (STRING, False), "title": (STRING, False), "position": (INTEGER, False)}
+ATTACHMENT_TYPES = dict(IMAGE_TYPES, description=(STRING, False))
+ACCESSORY_TYPES = {"uid": (STRING, False), "position": (INTEGER, False), "quantity": (NUMBER, False)}
+OPTION_TYPES = {"uid": (STRING, False), "name": (STRING, False), "price": (NUMBER, True), "position": (INTEGER, False)}
+LOCAL_PROPERTY_TYPES = {"uid": (STRING, False), "name": (STRING, False), "title": (STRING, False),
+                        "type": (INTEGER, False), "position": (INTEGER, False)}
+PROPERTY_GROUP_TYPES = {"uid": (STRING, False), "name": (STRING, False), "position": (INTEGER, False)}
+PROPERTY_TYPES = {
+    "uid": (STRING, False), "name": (STRING, False), "title": (STRING, False), "type": (INTEGER, False),
+    "position": (INTEGER, True), "group_position": (INTEGER, False), "local": (BOOLEAN, False),
+    "unit": (STRING, False), "display_on_product": (BOOLEAN, False), "variants": (BOOLEAN, False),
+    "filterable": (BOOLEAN, False), "configurable": (BOOLEAN, True), "price": (NUMBER, True),
+    "display_price": (BOOLEAN, True), "add_price": (BOOLEAN, True), "unit_min": (NUMBER, True),
+    "unit_max": (NUMBER, True), "unit_step": (NUMBER, True), "decimal_places": (INTEGER, True),
+    "required": (BOOLEAN, True), "step_type": (INTEGER, False), "step": (INTEGER, True),
+}
+STEP_TYPES = {"start": (NUMBER, False)}
+PROPERTY_VALUE_TYPES = {"property": (STRING, False), "parent": (STRING, False), "value": (VALUE, False),
+                        "type": (INTEGER, False)}
+
+
+class ArchiveError(Exception):
+    """Raised if an import archive is invalid. ``errors`` is the list of the
+    found errors.
+    """
+    def __init__(self, errors):
+        super(ArchiveError, self).__init__("\n".join(errors))
+        self.errors = errors
+
+
+class _TooManyErrors(Exception):
+    pass
+
+
+class _Errors(list):
+    def add(self, message, *args):
+        self.append(message.format(*args))
+        if len(self) >= MAX_ERRORS:
+            raise _TooManyErrors()
+
+
+def load_archive(fileobj):
+    """Opens and validates the passed import archive without any database
+    access. Returns the zip file and the decoded product records.
+
+    Checks the structure of the records, the references to other products,
+    properties and options and the presence of the images and attachments.
+    Raises ArchiveError with the list of found errors.
+
+    data.json is a single JSON document, which is decoded at once (the
+    standard library has no incremental parser). The records are checked one
+    by one afterwards and the decoded data is handed on to the import, hence
+    the archive is decoded only once.
+    """
+    if fileobj is None:
+        raise ArchiveError(["No file uploaded"])
+
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except (zipfile.BadZipfile, IOError) as e:
+        raise ArchiveError(["Invalid zip file: {}".format(e)])
+
+    try:
+        data = json.loads(zf.read("data.json"))
+    except KeyError:
+        raise ArchiveError(["Missing data.json"])
+    except ValueError as e:
+        raise ArchiveError(["Invalid data.json: {}".format(e)])
+
+    if not isinstance(data, list):
+        raise ArchiveError(["data.json: a list of products is expected"])
+
+    errors = _Errors()
+    try:
+        _validate(zf, data, errors)
+    except _TooManyErrors:
+        errors.append("Too many errors, validation stopped")
+    if errors:
+        raise ArchiveError(errors)
+
+    return zf, data
+
+
+def _validate(zf, data, errors):
+    # First run: collect the uids which may be referenced
+    product_uids = set()
+    products = []
+    properties = {}
+    for i, product in enumerate(data):
+        if not _check_keys(errors, "Product #{}".format(i), product, PRODUCT_KEYS):
+            continue
+        if not isinstance(product["uid"], six.string_types) or not product["uid"]:
+            errors.add("Product #{}: invalid uid {!r}", i, product["uid"])
+            continue
+        if product["uid"] in product_uids:
+            errors.add("Product {}: duplicate uid", product["uid"])
+        product_uids.add(product["uid"])
+        products.append(product)
+        _check_types(errors, "Product {}".format(product["uid"]), product, PRODUCT_TYPES)
+        for key in LIST_KEYS:
+            if not isinstance(product[key], list):
+                errors.add("Product {}: {} must be a list", product["uid"], key)
+
+        for prop in _iter_list(product["local_properties"]):
+            label = "Product {}: local property".format(product["uid"])
+            if _check_keys(errors, label, prop, LOCAL_PROPERTY_KEYS, LOCAL_PROPERTY_TYPES):
+                properties[prop["uid"]] = (True, prop["type"], _option_uids(errors, product["uid"], prop))
+
+        for property_group in _iter_list(product["property_groups"]):
+            label = "Product {}: property group".format(product["uid"])
+            if not _check_keys(errors, label, property_group, PROPERTY_GROUP_KEYS, PROPERTY_GROUP_TYPES):
+                continue
+            for prop in _iter_list(property_group["properties"]):
+                label = "Product {}: property group {}: property".format(product["uid"], property_group["uid"])
+                if not _check_keys(errors, label, prop, PROPERTY_KEYS, PROPERTY_TYPES):
+                    continue
+                properties[prop["uid"]] = (prop["local"], prop["type"], _option_uids(errors, product["uid"], prop))
+                for step in _iter_list(prop["steps"]):
+                    _check_keys(errors, "{} {}: step".format(label, prop["uid"]), step, STEP_KEYS, STEP_TYPES)
+
+    # Second run: values and references
+    members = set(zf.namelist())
+    for product in products:
+        uid = product["uid"]
+
+        if product["tax"] != "":
+            try:
+                float(product["tax"])
+            except (TypeError, ValueError):
+                errors.add("Product {}: invalid tax {!r}", uid, product["tax"])
+
+        if product.get("delivery_time"):
+            label = "Product {}: delivery time".format(uid)
+            _check_keys(errors, label, product["delivery_time"], DELIVERY_TIME_KEYS, DELIVERY_TIME_TYPES)
+
+        if product["parent"] and product["parent"] not in product_uids:
+            errors.add("Product {}: parent {} not found", uid, product["parent"])
+
+        for image in _iter_list(product["images"]):
+            if _check_keys(errors, "Product {}: image".format(uid), image, IMAGE_KEYS, IMAGE_TYPES):
+                if image["path"] not in members:
+                    errors.add("Product {}: image {} not found", uid, image["path"])
+
+        for attachment in _iter_list(product["attachments"]):
+            label = "Product {}: attachment".format(uid)
+            if _check_keys(errors, label, attachment, ATTACHMENT_KEYS, ATTACHMENT_TYPES):
+                if attachment["path"] not in members:
+                    errors.add("Product {}: attachment {} not found", uid, attachment["path"])
+
+        for accessory in _iter_list(product["accessories"]):
+            _check_keys(errors, "Product {}: accessory".format(uid), accessory, ACCESSORY_KEYS, ACCESSORY_TYPES)
+
+        for property_value in _iter_list(product["property_values"]):
+            label = "Product {}: property value".format(uid)
+            if not _check_keys(errors, label, property_value, PROPERTY_VALUE_KEYS, PROPERTY_VALUE_TYPES):
+                continue
+            if property_value["parent"] not in product_uids:
+                errors.add("Product {}: parent {} of property value not found", uid, property_value["parent"])
+            try:
+                local, type, options = properties[property_value["property"]]
+            except KeyError:
+                errors.add("Product {}: property {} of property value not found", uid, property_value["property"])
+                continue
+            if (local or type == PROPERTY_SELECT_FIELD) and property_value["value"] not in options:
+                errors.add(
+                    "Product {}: option {} of property {} not found",
+                    uid,
+                    property_value["value"],
+                    property_value["property"],
+                )
+
+
+def _check_keys(errors, label, record, keys, types=None):
+    """Returns True if the passed record is a dict which contains all keys
+    and whose values match the passed types (see ``_check_types``).
+    """
+    if not isinstance(record, dict):
+        errors.add("{}: an object is expected", label)
+        return False
+    uid = record.get("uid")
+    if isinstance(uid, six.string_types) and uid:
+        label = "{} {}".format(label, uid)
+    missing = [key for key in keys if key not in record]
+    if missing:
+        errors.add("{}: missing {}", label, ", ".join(missing))
+        return False
+    if types is not None:
+        return _check_types(errors, label, record, types)
+    return True
+
+
+def _check_types(errors, label, record, types):
+    """Returns True if the values of passed record match the passed types,
+    which is a dict of (type, nullable) by key.
+    """
+    valid = True
+    for key in sorted(types):
+        type, nullable = types[key]
+        value = record[key]
+        if value is None and nullable:
+            continue
+        if not _is_type(value, type):
+            errors.add("{}: {} must be {}, not {!r}", label, key, type, value)
+            valid = False
+    return valid
+
+
+def _is_type(value, type):
+    if type == STRING:
+        return isinstance(value, six.string_types)
+    if type == BOOLEAN:
+        return isinstance(value, bool)
+    if isinstance(value, bool):
+        return False
+    if type == INTEGER:
+        return isinstance(value, six.integer_types)
+    if type == NUMBER:
+        return isinstance(value, six.integer_types + (float, ))
+    if type == VALUE:
+        return isinstance(value, six.string_types + six.integer_types + (float, ))
+    return False
+
+
+def _option_uids(errors, product_uid, prop):
+    uids = set()
+    for option in _iter_list(prop["options"]):
+        label = "Product {}: property {}: option".format(product_uid, prop["uid"])
+        if _check_keys(errors, label, option, OPTION_KEYS, OPTION_TYPES):
+            uids.add(option["uid"])
+    return uids
+
+
+def _iter_list(value):
+    """Returns value if it is a list (otherwise it has been reported already)."""
+    return value if isinstance(value, list) else []
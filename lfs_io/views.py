@@ -1,15 +1,19 @@
 # Python imports
-import json
 import re
-import zipfile
+from collections import Counter
 
 # django imports
 from django.contrib.auth.decorators import permission_required
 from django.db import transaction
+from django.http import FileResponse
+from django.http import Http404
 from django.http import HttpResponse
+from django.http import HttpResponseBadRequest
+from django.shortcuts import get_object_or_404
 from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.template.defaultfilters import slugify
+from django.utils.encoding import force_text
 
 # lfs imports
 from lfs.catalog.models import FilterStep
@@ -30,6 +34,10 @@ from lfs.manufacturer.models import Manufacturer
 
 # lfs_io imports
 from lfs_io.forms import ImportForm
+from lfs_io.models import ExportJob
+from lfs_io.pipeline import read_products
+from lfs_io.validation import ArchiveError
+from lfs_io.validation import load_archive
 
 # django imports
 from django.core.files.base import ContentFile
@@ -40,12 +48,18 @@ import logging
 logger = logging.getLogger("lfs")
 
 
-@transaction.atomic
 @permission_required("core.manage_shop")
 def import_view(request, template_name="lfs_io/import.html"):
     form = ImportForm()
     if request.method == "POST":
-        _import(request)
+        # The archive is validated before any database work, hence invalid
+        # archives are rejected without a rollback.
+        try:
+            zf, data = load_archive(request.FILES.get("my_file"))
+        except ArchiveError as e:
+            return HttpResponseBadRequest("\n".join(e.errors), content_type="text/plain")
+        with transaction.atomic():
+            _import(zf, data)
         return HttpResponse("Finished!")
     else:
         return render_to_response(
@@ -59,224 +73,169 @@ def import_view(request, template_name="lfs_io/import.html"):
         )
 
 
-def _import(request):
-    zf = zipfile.ZipFile(request.FILES.get("my_file"))
-    data = json.loads(zf.open("data.json").read())
-    for product in data:
-        # No implemented yet
-        # new_product.creation_date = product["creation_date"]
-        # new_product.static_block = product["static_block"]
-        # new_product.price_calculator = product["price_calculation"]
-        # new_product.template = product[""]
-        # new_product.supplier = product["supplier"]
-        new_product, product_created = Product.objects.get_or_create(uid=product["uid"])
-        new_product.name = product["name"]
-        new_product.sku = product["sku"]
-        new_product.slug = product["slug"]
-        new_product.price = product["price"]
-        new_product.effective_price = product["effective_price"]
-        new_product.price_unit = product["price_unit"]
-        new_product.unit = product["unit"]
-        new_product.short_description = product["short_description"]
-        new_product.description = product["description"]
-        new_product.meta_title = product["meta_title"]
-        new_product.meta_keywords = product["meta_description"]
-        new_product.meta_description = product["meta_description"]
-        new_product.for_sale = product["for_sale"]
-        new_product.for_sale_price = product["for_sale_price"]
-        new_product.active = product["active"]
-        new_product.deliverable = product["deliverable"]
-        new_product.manual_delivery_time = product["manual_delivery_time"]
-        # new_product.delivery_time = product["delivery_time"]
-        new_product.order_time = product["order_time"]
-        new_product.manage_stock_amount = product["manage_stock_amount"]
-        new_product.stock_amount = product["stock_amount"]
-        new_product.active_packing_unit = product["active_packing_unit"]
-        new_product.packing_unit = product["packing_unit"]
-        new_product.packing_unit_unit = product["packing_unit_unit"] or ""
-        new_product.weight = product["weight"]
-        new_product.height = product["height"]
-        new_product.length = product["length"]
-        new_product.width = product["width"]
-        new_product.variants_display_type = product["variants_display_type"]
-        new_product.variant_position = product["variant_position"]
-        new_product.active_name = product["active_name"]
-        new_product.active_sku = product["active_sku"]
-        new_product.active_short_description = product["active_short_description"]
-        new_product.active_static_block = product["active_static_block"]
-        new_product.active_description = product["active_description"]
-        new_product.active_price = product["active_price"]
-        new_product.active_for_sale = product["active_for_sale"]
-        new_product.active_for_sale_price = product["active_for_sale_price"]
-        new_product.active_images = product["active_images"]
-        new_product.active_related_products = product["active_related_products"]
-        new_product.active_accessories = product["active_accessories"]
-        new_product.active_meta_title = product["active_meta_title"]
-        new_product.active_meta_description = product["active_meta_description"]
-        new_product.active_meta_keywords = product["active_meta_keywords"]
-        new_product.active_dimensions = product["active_dimensions"]
-        new_product.active_price_calculation = product["active_price_calculation"]
-        new_product.active_base_price = product["active_base_price"]
-        new_product.base_price_unit = product["base_price_unit"] or ""
-        new_product.base_price_amount = product["base_price_amount"]
-        new_product.sku_manufacturer = product["sku_manufacturer"]
-        new_product.type_of_quantity_field = product["type_of_quantity_field"]
-
-        # Ordered at
-        if product["ordered_at"]:
-            new_product.ordered_at = product["ordered_at"]
-
-        # Manufacturer
-        manufacturer, created = Manufacturer.objects.get_or_create(
-            name=product["manufacturer"],
-            slug=slugify(product["manufacturer"]),
-        )
-        new_product.manufacturer = manufacturer
-
-        # Tax
-        try:
-            tax, created = Tax.objects.get_or_create(rate=product["tax"])
-            new_product.tax = tax
-        except ValueError:
-            pass
-
-        # Delivery time
-        if product.get("delivery_time"):
-            delivery_time, created = DeliveryTime.objects.get_or_create(
-                min=product["delivery_time"]["min"],
-                max=product["delivery_time"]["max"],
-                unit=product["delivery_time"]["unit"],
-            )
-            delivery_time.description = product["delivery_time"]["description"]
-            delivery_time.save()
-
-            new_product.delivery_time = delivery_time
+@permission_required("core.manage_shop")
+def export_status_view(request, job_id, template_name="lfs_io/export_status.html"):
+    job = get_object_or_404(ExportJob, pk=job_id)
+    return render_to_response(
+        template_name,
+        RequestContext(
+            request,
+            {
+                "job": job,
+            },
+        ),
+    )
 
-        new_product.save()
 
-        if product_created:
-            logger.info("Product created {}".format(product["uid"]))
-        else:
-            logger.info("Product updated {}".format(product["uid"]))
-
-        # Images
-        new_product.images.all().delete()
-        for image in product.get("images"):
-            new_image = Image(
-                title=image["title"],
-                position=image["position"],
-                content=new_product,
-            )
-            new_image.image.save(image["name"], ContentFile(zf.open(image["path"]).read()))
-            new_image.save()
-
-        # Attachments
-        new_product.attachments.all().delete()
-        for attachment in product.get("attachments"):
-            new_attachment = ProductAttachment(
-                title=attachment["title"],
-                description=attachment["description"],
-                position=attachment["position"],
-                product=new_product,
+@permission_required("core.manage_shop")
+def export_download_view(request, job_id):
+    job = get_object_or_404(ExportJob, pk=job_id)
+    if job.get_download_url() is None:
+        raise Http404
+    response = FileResponse(job.file.storage.open(job.file.name, "rb"), content_type="application/zip")
+    response["Content-Disposition"] = "attachment; filename=%s.zip" % job.export.name
+    return response
+
+
+def _import(zf, data):
+    # Property groups and global properties are shared by many products, hence
+    # they are processed once up front.
+    property_groups = _sync_property_groups(data)
+    group_products = {}
+
+    products = read_products(zf, data)
+    try:
+        for product, media in products:
+            # No implemented yet
+            # new_product.creation_date = product["creation_date"]
+            # new_product.static_block = product["static_block"]
+            # new_product.price_calculator = product["price_calculation"]
+            # new_product.template = product[""]
+            # new_product.supplier = product["supplier"]
+            new_product, product_created = Product.objects.get_or_create(uid=product["uid"])
+            new_product.name = product["name"]
+            new_product.sku = product["sku"]
+            new_product.slug = product["slug"]
+            new_product.price = product["price"]
+            new_product.effective_price = product["effective_price"]
+            new_product.price_unit = product["price_unit"]
+            new_product.unit = product["unit"]
+            new_product.short_description = product["short_description"]
+            new_product.description = product["description"]
+            new_product.meta_title = product["meta_title"]
+            new_product.meta_keywords = product["meta_description"]
+            new_product.meta_description = product["meta_description"]
+            new_product.for_sale = product["for_sale"]
+            new_product.for_sale_price = product["for_sale_price"]
+            new_product.active = product["active"]
+            new_product.deliverable = product["deliverable"]
+            new_product.manual_delivery_time = product["manual_delivery_time"]
+            # new_product.delivery_time = product["delivery_time"]
+            new_product.order_time = product["order_time"]
+            new_product.manage_stock_amount = product["manage_stock_amount"]
+            new_product.stock_amount = product["stock_amount"]
+            new_product.active_packing_unit = product["active_packing_unit"]
+            new_product.packing_unit = product["packing_unit"]
+            new_product.packing_unit_unit = product["packing_unit_unit"] or ""
+            new_product.weight = product["weight"]
+            new_product.height = product["height"]
+            new_product.length = product["length"]
+            new_product.width = product["width"]
+            new_product.variants_display_type = product["variants_display_type"]
+            new_product.variant_position = product["variant_position"]
+            new_product.active_name = product["active_name"]
+            new_product.active_sku = product["active_sku"]
+            new_product.active_short_description = product["active_short_description"]
+            new_product.active_static_block = product["active_static_block"]
+            new_product.active_description = product["active_description"]
+            new_product.active_price = product["active_price"]
+            new_product.active_for_sale = product["active_for_sale"]
+            new_product.active_for_sale_price = product["active_for_sale_price"]
+            new_product.active_images = product["active_images"]
+            new_product.active_related_products = product["active_related_products"]
+            new_product.active_accessories = product["active_accessories"]
+            new_product.active_meta_title = product["active_meta_title"]
+            new_product.active_meta_description = product["active_meta_description"]
+            new_product.active_meta_keywords = product["active_meta_keywords"]
+            new_product.active_dimensions = product["active_dimensions"]
+            new_product.active_price_calculation = product["active_price_calculation"]
+            new_product.active_base_price = product["active_base_price"]
+            new_product.base_price_unit = product["base_price_unit"] or ""
+            new_product.base_price_amount = product["base_price_amount"]
+            new_product.sku_manufacturer = product["sku_manufacturer"]
+            new_product.type_of_quantity_field = product["type_of_quantity_field"]
+
+            # Ordered at
+            if product["ordered_at"]:
+                new_product.ordered_at = product["ordered_at"]
+
+            # Manufacturer
+            manufacturer, created = Manufacturer.objects.get_or_create(
+                name=product["manufacturer"],
+                slug=slugify(product["manufacturer"]),
             )
-            new_attachment.file.save(attachment["name"], ContentFile(zf.open(attachment["path"]).read()))
-            new_attachment.save()
-
-        # Local properties
-        for ppr in ProductsPropertiesRelation.objects.filter(product=new_product, property__local=True):
-            ppr.property.options.all().delete()
-            ppr.property.delete()
-            ppr.delete()
+            new_product.manufacturer = manufacturer
 
-        for prop in product["local_properties"]:
+            # Tax
             try:
-                Property.objects.get(uid=prop["uid"]).delete()
-            except Property.DoesNotExist:
+                tax, created = Tax.objects.get_or_create(rate=product["tax"])
+                new_product.tax = tax
+            except ValueError:
                 pass
-            new_prop = Property.objects.create(
-                uid=prop["uid"],
-                name=prop["name"],
-                title=prop["title"],
-                type=prop["type"],
-                local=True,
-            )
-            for option in prop["options"]:
-                try:
-                    PropertyOption.objects.get(uid=prop["uid"]).delete()
-                except PropertyOption.DoesNotExist:
-                    pass
-                PropertyOption.objects.create(
-                    property=new_prop,
-                    uid=option["uid"],
-                    name=option["name"],
-                    price=option["price"],
-                    position=option["position"],
+
+            # Delivery time
+            if product.get("delivery_time"):
+                delivery_time, created = DeliveryTime.objects.get_or_create(
+                    min=product["delivery_time"]["min"],
+                    max=product["delivery_time"]["max"],
+                    unit=product["delivery_time"]["unit"],
                 )
-            ProductsPropertiesRelation.objects.create(product=new_product, property=new_prop, position=prop["position"])
+                delivery_time.description = product["delivery_time"]["description"]
+                delivery_time.save()
 
-        # Property groups and global properties
-        for property_group in product["property_groups"]:
-            new_pg, created = PropertyGroup.objects.get_or_create(uid=property_group["uid"])
-            new_pg.name = property_group["name"]
-            new_pg.position = property_group["position"]
-            new_pg.save()
+                new_product.delivery_time = delivery_time
 
-            for prop in property_group["properties"]:
-                new_prop, created = Property.objects.get_or_create(uid=prop["uid"])
-                new_prop.name = prop["name"]
-                new_prop.title = prop["title"]
-                new_prop.position = prop["position"]
-                new_prop.unit = prop["unit"]
-                new_prop.display_on_product = prop["display_on_product"]
-                new_prop.local = prop["local"]
-                new_prop.variants = prop["variants"]
-                new_prop.filterable = prop["filterable"]
-                new_prop.configurable = prop["configurable"] or False
-                new_prop.type = prop["type"]
-                new_prop.price = prop["price"]
-                new_prop.display_price = prop["display_price"] or False
-                new_prop.add_price = prop["add_price"] or False
-                new_prop.unit_min = prop["unit_min"]
-                new_prop.unit_max = prop["unit_max"]
-                new_prop.unit_step = prop["unit_step"]
-                new_prop.decimal_places = prop["decimal_places"] or 0
-                new_prop.required = prop["required"] or False
-                new_prop.step_type = prop["step_type"]
-                new_prop.step = prop["step"]
-                new_prop.save()
-
-                gpr, created = GroupsPropertiesRelation.objects.get_or_create(
-                    group=new_pg,
-                    property=new_prop,
+            new_product.save()
+
+            if product_created:
+                logger.info("Product created {}".format(product["uid"]))
+            else:
+                logger.info("Product updated {}".format(product["uid"]))
+
+            # Images
+            new_product.images.all().delete()
+            for image in product.get("images"):
+                new_image = Image(
+                    title=image["title"],
+                    position=image["position"],
+                    content=new_product,
                 )
+                new_image.image.save(image["name"], ContentFile(media[image["path"]]))
+                new_image.save()
+
+            # Attachments
+            new_product.attachments.all().delete()
+            for attachment in product.get("attachments"):
+                new_attachment = ProductAttachment(
+                    title=attachment["title"],
+                    description=attachment["description"],
+                    position=attachment["position"],
+                    product=new_product,
+                )
+                new_attachment.file.save(attachment["name"], ContentFile(media[attachment["path"]]))
+                new_attachment.save()
 
-                gpr.position = prop["group_position"]
-                gpr.save()
-
-                # Options
-                for option in prop["options"]:
-                    try:
-                        po = PropertyOption.objects.get(uid=option["uid"])
-                    except PropertyOption.DoesNotExist:
-                        po = PropertyOption.objects.create(
-                            uid=option["uid"],
-                            property=new_prop,
-                        )
-                    po.property = new_prop
-                    po.name = option["name"]
-                    po.price = option["price"]
-                    po.position = option["position"]
-                    po.save()
-
-                # Steps
-                FilterStep.objects.filter(property=new_prop).delete()
-                for step in prop["steps"]:
-                    FilterStep.objects.create(
-                        property=new_prop,
-                        start=step["start"],
-                    )
+            # Local properties
+            _sync_local_properties(new_product, product["local_properties"])
+
+            # Property groups are linked in bulk after all products are saved
+            for property_group in product["property_groups"]:
+                group_products.setdefault(property_group["uid"], []).append(new_product.id)
+    finally:
+        # Stops the reader if the import fails
+        products.close()
 
-                new_pg.products.add(new_product)
+    _link_property_groups(property_groups, group_products)
 
     # Second run for dependencies to other products
     for product in data:
@@ -336,56 +295,7 @@ def _import(request):
         new_product.sub_type = product["sub_type"]
 
         # Property values
-        ProductPropertyValue.objects.filter(product=new_product).delete()
-        for property_value in product["property_values"]:
-            try:
-                parent = Product.objects.get(uid=property_value["parent"])
-            except Product.DoesNotExist:
-                logger.info(
-                    "Parent for property value not found: {} {}".format(new_product.uid, property_value["parent"])
-                )
-                continue
-
-            try:
-                prop = Property.objects.get(uid=property_value["property"])
-            except Property.DoesNotExist:
-                logger.info(
-                    "Property for property value not found: {} {}".format(new_product.uid, property_value["property"])
-                )
-                continue
-
-            if prop.local or (prop.type == PROPERTY_SELECT_FIELD):
-                try:
-                    value = PropertyOption.objects.get(uid=property_value["value"]).pk
-                except PropertyOption.DoesNotExist:
-                    logger.info(
-                        "PropertyOption for property value not found: {} {}".format(
-                            new_product.uid, property_value["value"]
-                        )
-                    )
-                    continue
-            else:
-                value = property_value["value"]
-
-            if prop.local:
-                ProductPropertyValue.objects.create(
-                    product=new_product,
-                    property=prop,
-                    value=value,
-                    type=property_value["type"],
-                    property_group=None,
-                )
-            else:
-                # Save the values for every group of the property. In 0.8 there
-                # was only one value for a property for all groups
-                for group in prop.groups.all():
-                    ProductPropertyValue.objects.create(
-                        product=new_product,
-                        property=prop,
-                        value=value,
-                        type=property_value["type"],
-                        property_group=group,
-                    )
+        _sync_property_values(new_product, product["property_values"])
 
         # price calculation
         def replace_uid(match):
@@ -400,3 +310,275 @@ def _import(request):
 
         new_product.price_calculation = price_calculation
         new_product.save()
+
+
+def _update_fields(obj, **values):
+    """Sets passed values on obj and saves only the fields which have been
+    changed. Returns True if obj has been saved.
+    """
+    changed = []
+    for name, value in values.items():
+        if getattr(obj, name) != value:
+            setattr(obj, name, value)
+            changed.append(name)
+    if changed:
+        obj.save(update_fields=changed)
+    return bool(changed)
+
+
+def _sync_property_groups(data):
+    """Upserts the distinct property groups and global properties (including
+    their options and steps) of the passed products. Returns a dict of the
+    property groups by uid.
+    """
+    groups = {}
+    properties = {}
+    positions = {}
+    for product in data:
+        for property_group in product["property_groups"]:
+            groups[property_group["uid"]] = property_group
+            for prop in property_group["properties"]:
+                properties[prop["uid"]] = prop
+                positions[(property_group["uid"], prop["uid"])] = prop["group_position"]
+
+    # Groups
+    new_groups = dict((pg.uid, pg) for pg in PropertyGroup.objects.filter(uid__in=groups.keys()))
+    for uid, property_group in groups.items():
+        try:
+            new_pg = new_groups[uid]
+        except KeyError:
+            new_groups[uid] = PropertyGroup.objects.create(
+                uid=uid,
+                name=property_group["name"],
+                position=property_group["position"],
+            )
+        else:
+            _update_fields(new_pg, name=property_group["name"], position=property_group["position"])
+
+    # Properties
+    new_properties = dict((p.uid, p) for p in Property.objects.filter(uid__in=properties.keys()))
+    for uid, prop in properties.items():
+        values = {
+            "name": prop["name"],
+            "title": prop["title"],
+            "position": prop["position"],
+            "unit": prop["unit"],
+            "display_on_product": prop["display_on_product"],
+            "local": prop["local"],
+            "variants": prop["variants"],
+            "filterable": prop["filterable"],
+            "configurable": prop["configurable"] or False,
+            "type": prop["type"],
+            "price": prop["price"],
+            "display_price": prop["display_price"] or False,
+            "add_price": prop["add_price"] or False,
+            "unit_min": prop["unit_min"],
+            "unit_max": prop["unit_max"],
+            "unit_step": prop["unit_step"],
+            "decimal_places": prop["decimal_places"] or 0,
+            "required": prop["required"] or False,
+            "step_type": prop["step_type"],
+            "step": prop["step"],
+        }
+        try:
+            new_prop = new_properties[uid]
+        except KeyError:
+            new_prop = new_properties[uid] = Property.objects.create(uid=uid, **values)
+        else:
+            _update_fields(new_prop, **values)
+
+        # Options
+        _sync_options(new_prop, prop["options"], delete=False)
+
+        # Steps
+        _sync_steps(new_prop, prop["steps"])
+
+    # Relations between groups and properties
+    gprs = dict(
+        ((gpr.group_id, gpr.property_id), gpr)
+        for gpr in GroupsPropertiesRelation.objects.filter(group__in=new_groups.values())
+    )
+    for (group_uid, property_uid), position in positions.items():
+        new_pg = new_groups[group_uid]
+        new_prop = new_properties[property_uid]
+        try:
+            gpr = gprs[(new_pg.id, new_prop.id)]
+        except KeyError:
+            GroupsPropertiesRelation.objects.create(group=new_pg, property=new_prop, position=position)
+        else:
+            _update_fields(gpr, position=position)
+
+    return new_groups
+
+
+def _link_property_groups(property_groups, group_products):
+    """Adds the products to the property groups in bulk.
+
+    group_products is a dict of product ids by property group uid.
+    """
+    through = PropertyGroup.products.through
+    for uid, product_ids in group_products.items():
+        new_pg = property_groups[uid]
+        existing = set(through.objects.filter(propertygroup=new_pg).values_list("product_id", flat=True))
+        through.objects.bulk_create(
+            [through(propertygroup=new_pg, product_id=product_id) for product_id in set(product_ids) - existing],
+            batch_size=500,
+        )
+
+
+def _sync_local_properties(new_product, local_properties):
+    """Reconciles the local properties (including their options) of passed
+    product with the passed records. Only changed rows are written.
+    """
+    uids = set(prop["uid"] for prop in local_properties)
+
+    # Local properties which don't exist within the archive anymore
+    for ppr in ProductsPropertiesRelation.objects.filter(product=new_product, property__local=True).select_related(
+        "property"
+    ):
+        if ppr.property.uid not in uids:
+            ppr.property.options.all().delete()
+            ppr.property.delete()
+            ppr.delete()
+
+    pprs = dict(
+        (ppr.property_id, ppr) for ppr in ProductsPropertiesRelation.objects.filter(product=new_product)
+    )
+    properties = dict((p.uid, p) for p in Property.objects.filter(uid__in=uids))
+
+    for prop in local_properties:
+        try:
+            new_prop = properties[prop["uid"]]
+        except KeyError:
+            new_prop = Property.objects.create(
+                uid=prop["uid"],
+                name=prop["name"],
+                title=prop["title"],
+                type=prop["type"],
+                local=True,
+            )
+        else:
+            _update_fields(new_prop, name=prop["name"], title=prop["title"], type=prop["type"], local=True)
+
+        _sync_options(new_prop, prop["options"])
+
+        try:
+            ppr = pprs[new_prop.id]
+        except KeyError:
+            ProductsPropertiesRelation.objects.create(product=new_product, property=new_prop, position=prop["position"])
+        else:
+            _update_fields(ppr, position=prop["position"])
+
+
+def _sync_options(new_prop, options, delete=True):
+    """Reconciles the options of passed property with the passed records. If
+    delete is True, options of the property which aren't within the records
+    are deleted.
+    """
+    uids = set(option["uid"] for option in options)
+    if delete:
+        new_prop.options.exclude(uid__in=uids).delete()
+
+    # Options are unique by uid, hence they may be moved from another property
+    existing = dict((po.uid, po) for po in PropertyOption.objects.filter(uid__in=uids))
+    for option in options:
+        try:
+            po = existing[option["uid"]]
+        except KeyError:
+            PropertyOption.objects.create(
+                property=new_prop,
+                uid=option["uid"],
+                name=option["name"],
+                price=option["price"],
+                position=option["position"],
+            )
+        else:
+            _update_fields(
+                po,
+                property_id=new_prop.id,
+                name=option["name"],
+                price=option["price"],
+                position=option["position"],
+            )
+
+
+def _sync_steps(new_prop, steps):
+    """Reconciles the filter steps of passed property with the passed
+    records.
+    """
+    missing = Counter(step["start"] for step in steps)
+    for step in FilterStep.objects.filter(property=new_prop):
+        if missing[step.start] > 0:
+            missing[step.start] -= 1
+        else:
+            step.delete()
+
+    for start, amount in missing.items():
+        for i in range(amount):
+            FilterStep.objects.create(property=new_prop, start=start)
+
+
+def _sync_property_values(new_product, property_values):
+    """Reconciles the property values of passed product with the passed
+    records. sub_type and parent of the product need to be set before.
+    """
+    # The key corresponds to the unique constraint of ProductPropertyValue
+    values = {}
+    for property_value in property_values:
+        try:
+            Product.objects.get(uid=property_value["parent"])
+        except Product.DoesNotExist:
+            logger.info(
+                "Parent for property value not found: {} {}".format(new_product.uid, property_value["parent"])
+            )
+            continue
+
+        try:
+            prop = Property.objects.get(uid=property_value["property"])
+        except Property.DoesNotExist:
+            logger.info(
+                "Property for property value not found: {} {}".format(new_product.uid, property_value["property"])
+            )
+            continue
+
+        if prop.local or (prop.type == PROPERTY_SELECT_FIELD):
+            try:
+                value = PropertyOption.objects.get(uid=property_value["value"]).pk
+            except PropertyOption.DoesNotExist:
+                logger.info(
+                    "PropertyOption for property value not found: {} {}".format(
+                        new_product.uid, property_value["value"]
+                    )
+                )
+                continue
+        else:
+            value = property_value["value"]
+
+        if prop.local:
+            groups = [None]
+        else:
+            # Save the values for every group of the property. In 0.8 there
+            # was only one value for a property for all groups
+            groups = prop.groups.all()
+
+        for group in groups:
+            key = (prop.id, group.id if group else None, force_text(value), property_value["type"])
+            values[key] = (prop, group)
+
+    for ppv in ProductPropertyValue.objects.filter(product=new_product):
+        key = (ppv.property_id, ppv.property_group_id, ppv.value, ppv.type)
+        if values.pop(key, None) is None:
+            ppv.delete()
+
+    for (property_id, group_id, value, type), (prop, group) in values.items():
+        ProductPropertyValue.objects.create(
+            product=new_product,
+            property=prop,
+            value=value,
+            type=type,
+            property_group=group,
+        )
+
+    # Kept values need the current parent (see ProductPropertyValue.save)
+    parent_id = new_product.parent_id if new_product.is_variant() else new_product.id
+    ProductPropertyValue.objects.filter(product=new_product).exclude(parent_id=parent_id).update(parent_id=parent_id)